@@ -0,0 +1,263 @@
+import numpy as np
+from functools import lru_cache
+
+
+# color spaces every analyzer can work in
+COLOR_SPACES = ("rgb", "luma", "linear", "hsv", "lab")
+
+# same weights as the luminosity estimate used for the black bars / light maps
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+# linear RGB -> XYZ, and the reference white, for sRGB under D65
+RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+XYZ_TO_RGB = np.linalg.inv(RGB_TO_XYZ)
+D65_WHITE = RGB_TO_XYZ.sum(axis=1)
+
+
+@lru_cache(maxsize=None)
+def luma_luts():
+    """
+    Return one 256-entry table per channel holding that channel's share of the luma,
+    so the luma of a frame is three lookups and two additions.
+    """
+    levels = np.arange(256, dtype=np.float64)
+    return tuple(levels * weight for weight in LUMA_WEIGHTS)
+
+
+@lru_cache(maxsize=None)
+def linear_lut():
+    """
+    Return the 256-entry table from an 8-bit sRGB value to linear light in [0, 1].
+    """
+    c = np.arange(256, dtype=np.float64) / 255
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def to_array(img):
+    """
+    Return the pixels of a PIL Image (or an array) as a uint8 (H, W, 3) RGB array.
+    """
+    if isinstance(img, np.ndarray):
+        return img
+    return np.asarray(img.convert("RGB"))
+
+
+def to_luma(rgb):
+    """
+    Return the (H, W) luma of an RGB array, 0.299*r + 0.587*g + 0.114*b.
+    """
+    lut_r, lut_g, lut_b = luma_luts()
+    return lut_r[rgb[..., 0]] + lut_g[rgb[..., 1]] + lut_b[rgb[..., 2]]
+
+
+def to_linear(rgb):
+    """
+    Return the linear light (H, W, 3) of an RGB array, in [0, 1].
+    """
+    return linear_lut()[rgb]
+
+
+def to_hsv(rgb):
+    """
+    Return the (H, W, 3) HSV of an RGB array: hue in degrees [0, 360),
+    saturation and value in [0, 1].
+    """
+    rgb = rgb / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    delta = v - rgb.min(axis=-1)
+    s = np.divide(delta, v, out=np.zeros_like(v), where=v > 0)
+
+    # hue depends on which channel is the maximum
+    safe_delta = np.where(delta > 0, delta, 1)
+    h = np.where(
+        v == r,
+        (g - b) / safe_delta,
+        np.where(v == g, 2 + (b - r) / safe_delta, 4 + (r - g) / safe_delta),
+    )
+    h = np.where(delta > 0, (h * 60) % 360, 0)
+    return np.stack([h, s, v], axis=-1)
+
+
+def to_lab(rgb):
+    """
+    Return the (H, W, 3) CIELAB (D65) of an RGB array: L in [0, 100], a and b
+    roughly in [-128, 127].
+    """
+    xyz = (to_linear(rgb) @ RGB_TO_XYZ.T) / D65_WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    fx, fy, fz = f[..., 0], f[..., 1], f[..., 2]
+    return np.stack([116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)], axis=-1)
+
+
+def convert(rgb, space):
+    """
+    Convert an RGB array to one of COLOR_SPACES.
+    """
+    if space == "rgb":
+        return rgb
+    if space == "luma":
+        return to_luma(rgb)
+    if space == "linear":
+        return to_linear(rgb)
+    if space == "hsv":
+        return to_hsv(rgb)
+    if space == "lab":
+        return to_lab(rgb)
+    raise ValueError(f"color space must be one of {COLOR_SPACES}, got {space!r}")
+
+
+def to_rgb(values, space):
+    """
+    Convert values in 'space' back to RGB, as floats in [0, 255].
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if space == "rgb":
+        rgb = values
+    elif space == "luma":
+        rgb = np.stack([values] * 3, axis=-1)
+    elif space == "linear":
+        c = np.clip(values, 0, 1)
+        rgb = 255 * np.where(c <= 0.0031308, c * 12.92, 1.055 * c ** (1 / 2.4) - 0.055)
+    elif space == "hsv":
+        h, s, v = values[..., 0] / 60, values[..., 1], values[..., 2]
+        sector = np.floor(h) % 6
+        frac = h - np.floor(h)
+        p, q, t = v * (1 - s), v * (1 - s * frac), v * (1 - s * (1 - frac))
+        choices = [
+            np.stack(channels, axis=-1)
+            for channels in [
+                (v, t, p),
+                (q, v, p),
+                (p, v, t),
+                (p, q, v),
+                (t, p, v),
+                (v, p, q),
+            ]
+        ]
+        rgb = 255 * np.select([(sector == i)[..., None] for i in range(6)], choices)
+    elif space == "lab":
+        fy = (values[..., 0] + 16) / 116
+        f = np.stack(
+            [fy + values[..., 1] / 500, fy, fy - values[..., 2] / 200], axis=-1
+        )
+        xyz = np.where(f > 6 / 29, f**3, 3 * (6 / 29) ** 2 * (f - 4 / 29))
+        rgb = to_rgb((xyz * D65_WHITE) @ XYZ_TO_RGB.T, "linear")
+    else:
+        raise ValueError(f"color space must be one of {COLOR_SPACES}, got {space!r}")
+    return np.clip(rgb, 0, 255)
+
+
+def mean_color(values, space):
+    """
+    Average the pixels of an array in 'space'. Hue is averaged on the circle,
+    so red at 350 and 10 degrees averages to 0 and not to cyan at 180.
+    Each hue is weighted by its saturation: grays, black and white have a hue
+    of 0 (red) that means nothing, and must not pull the average towards red.
+    """
+    if space == "luma":
+        return values.mean()
+    values = values.reshape(-1, values.shape[-1])
+    mean = values.mean(axis=0)
+    if space == "hsv":
+        hue = np.deg2rad(values[:, 0])
+        saturation = values[:, 1]
+        mean[0] = (
+            np.rad2deg(
+                np.arctan2(
+                    (saturation * np.sin(hue)).mean(),
+                    (saturation * np.cos(hue)).mean(),
+                )
+            )
+            % 360
+        )
+    return mean
+
+
+def to_brightness(rgb, space="luma"):
+    """
+    Return the (H, W) brightness of an RGB array in [0, 255], measured in 'space':
+    luma, lightness L* for "lab", value V for "hsv", linear luminance for "linear".
+    """
+    if space in ("rgb", "luma"):
+        return to_luma(rgb)
+    if space == "linear":
+        return 255 * (to_linear(rgb) @ RGB_TO_XYZ[1])
+    if space == "hsv":
+        return rgb.max(axis=-1).astype(np.float64)
+    if space == "lab":
+        return to_lab(rgb)[..., 0] * 2.55
+    raise ValueError(f"color space must be one of {COLOR_SPACES}, got {space!r}")
+
+
+@lru_cache(maxsize=None)
+def gray_brightness_lut(space):
+    """
+    Return the brightness in 'space' of each of the 256 gray levels.
+    """
+    grays = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+    return to_brightness(grays, space)
+
+
+def convert_threshold(value, space="luma"):
+    """
+    Convert a brightness threshold given as luma into the brightness of 'space',
+    through the gray with that luma. A luma of 10 is a linear luminance of
+    about 0.8, so the same number cannot be used in every space.
+    """
+    if space in ("rgb", "luma"):
+        return value
+    return float(np.interp(value, np.arange(256), gray_brightness_lut(space)))
+
+
+class ColorFrame:
+    """
+    An RGB frame that keeps every conversion it was asked for, so analyzers
+    working on the same frame share a single conversion per color space.
+    """
+
+    def __init__(self, img):
+        self.rgb = to_array(img)
+        self._cache = {}
+
+    @property
+    def size(self):
+        # (width, height), the same order as PIL
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+    def get(self, space):
+        """
+        Return the frame converted to 'space'.
+        """
+        if space not in self._cache:
+            self._cache[space] = convert(self.rgb, space)
+        return self._cache[space]
+
+    def brightness(self, space="luma"):
+        """
+        Return the (H, W) brightness of the frame, see to_brightness.
+        """
+        key = ("brightness", space)
+        if key not in self._cache:
+            if space in ("rgb", "luma"):
+                self._cache[key] = self.get("luma")
+            elif space == "lab":
+                self._cache[key] = self.get("lab")[..., 0] * 2.55
+            else:
+                self._cache[key] = to_brightness(self.rgb, space)
+        return self._cache[key]
+
+
+def color_frame(img):
+    """
+    Return 'img' as a ColorFrame, reusing it if it already is one.
+    """
+    if isinstance(img, ColorFrame):
+        return img
+    return ColorFrame(img)
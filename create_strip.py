@@ -1,29 +1,42 @@
 import os
-from PIL import Image
 import math
-
-
-def create_image_strip():
-    movies = [
-        "under_the_sea",
-        "prince",
-        "part_of_your_world",
-        "poor_unfortunate_souls",
-        "vanessa_trick",
-        "kiss_the_girl",
-        "for_the_first_time",
-        # "the_scuttlebutt",
-        "llm",
-    ]
-
-    width_cnt = 30  # each palette image will have 4 x 4 = 16 blocks
+from lazy import LazyModule
+
+
+# imported the first time create_image_strip runs
+Image = LazyModule("PIL.Image")
+
+
+default_movies = [
+    "under_the_sea",
+    "prince",
+    "part_of_your_world",
+    "poor_unfortunate_souls",
+    "vanessa_trick",
+    "kiss_the_girl",
+    "for_the_first_time",
+    # "the_scuttlebutt",
+    "llm",
+]
+
+
+def create_image_strip(
+    movies=None,
+    videos_dir="./output/videos",
+    width_cnt=30,
+    scale_size=50,
+    output_path="strip_image.png",
+):
+    if movies is None:
+        movies = default_movies
+    # each palette image will have 4 x 4 = 16 blocks, width_cnt of them per row
     height_cnt = 0
 
     movies_frames_cnt = {}
 
     for mov in movies:
         movies_frames_cnt[mov] = 0
-        main_dir = f"./output/videos/{mov}/frames"
+        main_dir = os.path.join(videos_dir, mov, "frames")
         folders = os.listdir(main_dir)
 
         movie_total_frames = 0
@@ -48,6 +61,19 @@ def create_image_strip():
         height_cnt += rows
         print(height_cnt * 4)
 
+    # a movie with fewer than width_cnt palettes does not fill a single row
+    short_movies = [mov for mov in movies if movies_frames_cnt[mov] == 0]
+    if short_movies:
+        print(
+            f"Skipping movies with fewer than {width_cnt} palettes:",
+            ", ".join(short_movies),
+        )
+        movies = [mov for mov in movies if movies_frames_cnt[mov] > 0]
+    if not movies:
+        raise ValueError(
+            f"No movie has the {width_cnt} palettes needed to fill a strip row"
+        )
+
     # since we have a 4 x 4 grid we should create an image of width_cnt * 4 and height_cnt * 4
     total_width = width_cnt * 4
     total_height = height_cnt * 4
@@ -62,7 +88,7 @@ def create_image_strip():
     for i in range(len(movies)):
         # now we need to fill in the strip image
         mov = movies[i]
-        main_dir = f"./output/videos/{mov}/frames"
+        main_dir = os.path.join(videos_dir, mov, "frames")
         folders = os.listdir(main_dir)
 
         row_start_y = sum(
@@ -119,11 +145,10 @@ def create_image_strip():
                 strip_image.putpixel((x, row_start_y), (255, 0, 0, 10))
 
     # enlarge the image
-    scale_size = 50
     strip_image = strip_image.resize(
         (total_width * scale_size, total_height * scale_size), Image.NEAREST
     )
-    strip_image.save("strip_image.png")
+    strip_image.save(output_path)
 
 
 if __name__ == "__main__":
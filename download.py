@@ -1,27 +1,44 @@
-from pytube import YouTube
-
 # where to save
 SAVE_PATH = ""  # to_do
 
 # link of the video to be downloaded
 link = "https://youtube.com/shorts/akL53YfPTfI?si=ju1ohfkBdFSInLNj"
 
-try:
-    # object creation using YouTube
-    yt = YouTube(link)
-except:
-    # to handle exception
-    print("Connection Error")
-
-# Get all streams and filter for mp4 files
-mp4_streams = yt.streams.filter(file_extension="mp4").all()
-
-# get the video with the highest resolution
-d_video = mp4_streams[-1]
-
-try:
-    # downloading the video
-    d_video.download(output_path=SAVE_PATH)
-    print("Video downloaded successfully!")
-except:
-    print("Some Error!")
+
+def download_video(link, save_path=SAVE_PATH, filename=None):
+    """
+    Download the highest resolution mp4 stream of a YouTube video.
+
+    :param link: URL of the video.
+    :param save_path: Directory to save the video in.
+    :param filename: Name of the saved file, defaults to the video title.
+    :return: Path of the downloaded file, or None if the download failed.
+    """
+    from pytube import YouTube
+
+    try:
+        # object creation using YouTube
+        yt = YouTube(link)
+    except:
+        # to handle exception
+        print("Connection Error")
+        return None
+
+    # Get all streams and filter for mp4 files
+    mp4_streams = yt.streams.filter(file_extension="mp4").all()
+
+    # get the video with the highest resolution
+    d_video = mp4_streams[-1]
+
+    try:
+        # downloading the video
+        path = d_video.download(output_path=save_path, filename=filename)
+        print("Video downloaded successfully!")
+        return path
+    except:
+        print("Some Error!")
+        return None
+
+
+if __name__ == "__main__":
+    download_video(link)
@@ -1,71 +1,76 @@
 import os
-from PIL import Image
 from collections import Counter
+from lazy import LazyModule
 
 
-def detect_black_bars(img, brightness_threshold=10, coverage_threshold=0.98):
+# heavy dependencies, imported the first time a function uses them
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+colors = LazyModule("colors")
+
+
+# prefixes of the images process_frames saves next to each frame
+OUTPUT_PREFIXES = ("dominant_", "average_", "palette_", "lightmap_")
+
+
+def detect_black_bars(
+    img, brightness_threshold=10, coverage_threshold=0.98, color_space="luma"
+):
     """
     Detect how many rows from the top and bottom are effectively "black bars".
     We do this by checking each row's average brightness; if it's below
     brightness_threshold for almost all pixels, we consider it a black row.
 
-    :param img: PIL Image in RGB (or converted to RGB).
-    :param brightness_threshold: Max average brightness for a pixel to be considered black.
+    :param img: PIL Image in RGB (or converted to RGB), or a ColorFrame.
+    :param brightness_threshold: Max average brightness for a pixel to be considered black,
+                                 as luma; it is converted into 'color_space'.
     :param coverage_threshold: Fraction of pixels in a row that must be below threshold to
                                treat that entire row as black.
+    :param color_space: How brightness is measured, see colors.to_brightness.
     :return: (top_crop, bottom_crop) in pixels
     """
-    width, height = img.size
-    pixels = img.load()
-
-    def row_is_black(row_index):
-        """Check if a row is 'black' under the given threshold rules."""
-        black_count = 0
-        for x in range(width):
-            r, g, b = pixels[x, row_index]
-            # Simple luminosity estimate
-            lum = 0.299 * r + 0.587 * g + 0.114 * b
-            if lum < brightness_threshold:
-                black_count += 1
-        # If enough pixels are under the threshold, mark the entire row black
-        return (black_count / width) >= coverage_threshold
-
-    # Detect top black rows
-    top_crop = 0
-    for row in range(height):
-        if row_is_black(row):
-            top_crop += 1
-        else:
-            break
-
-    # Detect bottom black rows
-    bottom_crop = 0
-    for row in range(height - 1, -1, -1):
-        if row_is_black(row):
-            bottom_crop += 1
-        else:
-            break
+    frame = colors.color_frame(img)
+    threshold = colors.convert_threshold(brightness_threshold, color_space)
+
+    # If enough pixels are under the threshold, mark the entire row black
+    black = frame.brightness(color_space) < threshold
+    rows_black = black.mean(axis=1) >= coverage_threshold
+
+    height = len(rows_black)
+    if rows_black.all():
+        return (height, height)
+
+    # Count the black rows before the first non-black row, from each side
+    top_crop = int(np.argmin(rows_black))
+    bottom_crop = int(np.argmin(rows_black[::-1]))
 
     return (top_crop, bottom_crop)
 
 
-def get_average_color(img):
+def get_average_color(img, color_space="rgb", box=None):
     """
     Return the (R, G, B) average color of an image.
+
+    :param img: PIL Image or ColorFrame.
+    :param color_space: Color space the pixels are averaged in (see colors.COLOR_SPACES),
+                        the average is converted back to RGB.
+    :param box: Optional (left, upper, right, lower) region to average, like Image.crop.
     """
-    # Convert to RGB just in case
-    img = img.convert("RGB")
-    pixels = img.getdata()
-    r_total, g_total, b_total = 0, 0, 0
-    count = 0
+    frame = colors.color_frame(img)
+    values = frame.get(color_space)
+    if box is not None:
+        left, top, right, bottom = box
+        values = values[top:bottom, left:right]
 
-    for r, g, b in pixels:
-        r_total += r
-        g_total += g
-        b_total += b
-        count += 1
+    if color_space == "rgb":
+        # integer sums, the same result as adding up the pixels one by one
+        pixels = values.reshape(-1, 3)
+        count = len(pixels)
+        r_total, g_total, b_total = pixels.sum(axis=0, dtype=np.int64)
+        return (int(r_total) // count, int(g_total) // count, int(b_total) // count)
 
-    return (r_total // count, g_total // count, b_total // count)
+    avg_color = colors.to_rgb(colors.mean_color(values, color_space), color_space)
+    return tuple(int(c) for c in np.rint(avg_color))
 
 
 def get_dominant_color(img, resize=150):
@@ -73,6 +78,8 @@ def get_dominant_color(img, resize=150):
     Return the dominant color (R, G, B) of the image by counting most frequent pixel.
     For performance, we resize the image to at most 'resize' in width or height.
     """
+    if isinstance(img, colors.ColorFrame):
+        img = Image.fromarray(img.rgb)
     img = img.convert("RGB")
     # Optionally resize to speed up the process for large images
     w, h = img.size
@@ -96,19 +103,23 @@ def create_color_block(color, size=(100, 100)):
     return block
 
 
-def create_color_palette(img, grid_size=(4, 4), block_size=(50, 50)):
+def create_color_palette(img, grid_size=(4, 4), block_size=(50, 50), color_space="rgb"):
     """
     Create a 4x4 color palette image, where each cell is the average color
     of that region in the original image.
 
-    :param img: Cropped PIL Image.
+    :param img: Cropped PIL Image, or a ColorFrame.
     :param grid_size: (rows, cols) - default is 4x4.
     :param block_size: (width, height) of each cell in the output palette image.
+    :param color_space: Color space each cell is averaged in.
     :return: A new PIL Image object with the palette.
     """
     rows, cols = grid_size
     block_w, block_h = block_size
-    width, height = img.size
+
+    # Convert once, every cell reads from the same converted frame
+    frame = colors.color_frame(img)
+    width, height = frame.size
 
     # Dimensions in the original for each subregion
     sub_w = width // cols
@@ -116,9 +127,6 @@ def create_color_palette(img, grid_size=(4, 4), block_size=(50, 50)):
 
     palette_img = Image.new("RGB", (block_w * cols, block_h * rows))
 
-    # Convert once, so we can read pixel data
-    img_rgb = img.convert("RGB")
-
     for row in range(rows):
         for col in range(cols):
             # Calculate the sub-box in the original image
@@ -127,10 +135,10 @@ def create_color_palette(img, grid_size=(4, 4), block_size=(50, 50)):
             right = left + sub_w
             bottom = top + sub_h
 
-            # Crop that region
-            region = img_rgb.crop((left, top, right, bottom))
-            # Average color
-            avg_color = get_average_color(region)
+            # Average color of that region
+            avg_color = get_average_color(
+                frame, color_space, box=(left, top, right, bottom)
+            )
 
             # Create a small block
             block = create_color_block(avg_color, size=block_size)
@@ -141,27 +149,31 @@ def create_color_palette(img, grid_size=(4, 4), block_size=(50, 50)):
     return palette_img
 
 
-def create_light_map(img, grid_size=(4, 4), block_size=(50, 50)):
+def create_light_map(img, grid_size=(4, 4), block_size=(50, 50), color_space="luma"):
     """
     Create a 4x4 lightness map image, where each cell’s brightness
     is the average brightness of that region in the original image.
     We fill each cell with a grayscale value corresponding to that brightness.
 
-    :param img: Cropped PIL Image.
+    :param img: Cropped PIL Image, or a ColorFrame.
     :param grid_size: (rows, cols) - default is 4x4.
     :param block_size: (width, height) of each cell in the output.
+    :param color_space: How brightness is measured, see colors.to_brightness.
     :return: A new PIL Image object with the lightness map.
     """
     rows, cols = grid_size
     block_w, block_h = block_size
-    width, height = img.size
+
+    frame = colors.color_frame(img)
+    width, height = frame.size
 
     sub_w = width // cols
     sub_h = height // rows
 
     lightmap = Image.new("RGB", (block_w * cols, block_h * rows))
 
-    img_rgb = img.convert("RGB")
+    # E.g., lum = 0.299*r + 0.587*g + 0.114*b for every pixel at once
+    brightness = frame.brightness(color_space)
 
     for row in range(rows):
         for col in range(cols):
@@ -170,18 +182,8 @@ def create_light_map(img, grid_size=(4, 4), block_size=(50, 50)):
             right = left + sub_w
             bottom = top + sub_h
 
-            region = img_rgb.crop((left, top, right, bottom))
-
-            # Compute average brightness (grayscale)
-            # E.g., lum = 0.299*r + 0.587*g + 0.114*b
-            # We'll do a quick average on the entire region
-            pixels = region.getdata()
-            lum_total = 0
-            count = 0
-            for r, g, b in pixels:
-                lum_total += 0.299 * r + 0.587 * g + 0.114 * b
-                count += 1
-            avg_lum = int(lum_total / count)
+            # Compute average brightness (grayscale) of the region
+            avg_lum = int(brightness[top:bottom, left:right].mean())
 
             # Create a grayscale color block
             gray_block = create_color_block(
@@ -192,7 +194,7 @@ def create_light_map(img, grid_size=(4, 4), block_size=(50, 50)):
     return lightmap
 
 
-def process_frames(directory):
+def process_frames(directory, color_space="rgb", brightness_space="luma"):
     """
     1. Find all images in 'directory'.
     2. Pick the middle image to detect black bars and compute top/bottom crop.
@@ -202,12 +204,16 @@ def process_frames(directory):
        - Compute and save "average_" block
        - Compute and save "palette_" image (4x4 color map)
        - Compute and save "lightmap_" image (4x4 grayscale map)
+
+    :param color_space: Color space the average color and palette are computed in.
+    :param brightness_space: Color space the black bars and light map brightness use.
     """
-    # Gather images
+    # Gather images, skipping the ones saved by a previous run
     all_files = [
         f
         for f in os.listdir(directory)
         if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        and not f.startswith(OUTPUT_PREFIXES)
     ]
     if not all_files:
         print("No images found in directory:", directory)
@@ -220,7 +226,7 @@ def process_frames(directory):
 
     # Detect black bars using the sample image
     sample_img = Image.open(sample_path).convert("RGB")
-    top_crop, bottom_crop = detect_black_bars(sample_img)
+    top_crop, bottom_crop = detect_black_bars(sample_img, color_space=brightness_space)
 
     print(
         f"Detected top_crop={top_crop}, bottom_crop={bottom_crop} using sample image: {all_files[mid_index]}"
@@ -236,34 +242,51 @@ def process_frames(directory):
         # print(w, h - bottom_crop)
         cropped_img = img.crop((0, top_crop, w, h - bottom_crop))
         base_name, ext = os.path.splitext(filename)
+        # conversions are cached on the frame and shared by every analyzer below
+        frame = colors.ColorFrame(cropped_img)
 
         # --- 1) Dominant color ---
-        dominant_color = get_dominant_color(cropped_img)
+        dominant_color = get_dominant_color(frame)
         dominant_block = create_color_block(dominant_color, size=(100, 100))
         dominant_block.save(os.path.join(directory, f"dominant_{base_name}.jpg"))
 
         # --- 2) Average color ---
-        avg_color = get_average_color(cropped_img)
+        avg_color = get_average_color(frame, color_space)
         avg_block = create_color_block(avg_color, size=(100, 100))
         avg_block.save(os.path.join(directory, f"average_{base_name}.jpg"))
 
         # --- 3) 4x4 color palette ---
         palette = create_color_palette(
-            cropped_img, grid_size=(4, 4), block_size=(50, 50)
+            frame, grid_size=(4, 4), block_size=(50, 50), color_space=color_space
         )
         palette.save(os.path.join(directory, f"palette_{base_name}.jpg"))
 
         # --- 4) 4x4 light map ---
-        light_map = create_light_map(cropped_img, grid_size=(4, 4), block_size=(50, 50))
+        light_map = create_light_map(
+            frame, grid_size=(4, 4), block_size=(50, 50), color_space=brightness_space
+        )
         light_map.save(os.path.join(directory, f"lightmap_{base_name}.jpg"))
 
         print(f"Processed {filename}")
 
 
+def process_movie(
+    video_name, videos_dir="output/videos", color_space="rgb", brightness_space="luma"
+):
+    """
+    Run process_frames on every chunk folder that split_video_to_chunks
+    created for 'video_name'.
+    """
+    frames_root = os.path.join(videos_dir, video_name, "frames")
+    for dir in sorted(os.listdir(frames_root)):
+        frames_dir = os.path.join(frames_root, dir)
+        # skip the light direction folders and stray files
+        if not os.path.isdir(frames_dir) or not dir.startswith("chunk_"):
+            continue
+        print(dir)
+        process_frames(frames_dir, color_space, brightness_space)
+
+
 if __name__ == "__main__":
     video_name = "llm"
-    all_dirs = os.listdir(f"output/videos/{video_name}/frames")
-    for dir in all_dirs:
-        print(dir)
-        frames_dir = f"output/videos/{video_name}/frames/{dir}"
-        process_frames(frames_dir)
+    process_movie(video_name)
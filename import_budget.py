@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+
+
+# cumulative time allowed to import each entry point, in milliseconds
+IMPORT_BUDGET_MS = {
+    "main": 30,
+    "frames": 30,
+    "light_direction": 30,
+    "create_strip": 20,
+    "video": 20,
+    "download": 20,
+    "pipeline": 50,
+    "generate": 20,
+    # imports NumPy and PIL at the top, about 100 ms of this is theirs
+    "palette_index": 200,
+}
+
+# dependencies that must only be imported by the functions that use them
+HEAVY_MODULES = ("numpy", "PIL", "moviepy", "pytube")
+
+# entry points allowed to import some heavy modules at the top: every function
+# of palette_index works on NumPy arrays, so there is nothing to defer
+ALLOWED_HEAVY_MODULES = {"palette_index": ("numpy", "PIL")}
+
+# each import runs in a fresh interpreter; the fastest run is kept
+repeat = 5
+
+
+def measure_import(module):
+    """
+    Import 'module' in a fresh interpreter with -X importtime.
+
+    :return: (milliseconds, heavy modules it pulled in)
+    """
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.splitlines()[-1]}")
+
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise RuntimeError(f"no -X importtime entry found for module {module}")
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    return cumulative_us / 1000, heavy
+
+
+def check_import_budget():
+    """
+    Measure every entry point against its budget and print a report.
+
+    :return: True if every entry point is within budget and imports no heavy module.
+    """
+    ok = True
+    print(f"{'module':<16} {'ms':>7} {'budget':>7}  heavy imports")
+    for module, budget_ms in IMPORT_BUDGET_MS.items():
+        runs = [measure_import(module) for _ in range(repeat)]
+        ms = min(run[0] for run in runs)
+        allowed = ALLOWED_HEAVY_MODULES.get(module, ())
+        heavy = [m for m in runs[0][1] if m not in allowed]
+        status = "ok" if ms <= budget_ms and not heavy else "FAIL"
+        if status == "FAIL":
+            ok = False
+        print(
+            f"{module:<16} {ms:>7.1f} {budget_ms:>7}  {', '.join(heavy) or '-'}"
+            f"  {status}"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    if not check_import_budget():
+        sys.exit(1)
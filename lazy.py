@@ -0,0 +1,18 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported the first time one of its
+    attributes is used, so importing a script does not pay for its heavy
+    dependencies until a function actually needs them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
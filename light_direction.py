@@ -1,12 +1,18 @@
 import os
-from PIL import Image
-import numpy as np
 import shutil
+from lazy import LazyModule
 
 
-def get_light_direction_3x3(image_path):
+# heavy dependencies, imported the first time a function uses them
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+colors = LazyModule("colors")
+
+
+def get_light_direction_3x3(image_path, color_space="luma"):
     """
-    1) Load an image in grayscale;
+    1) Load an image in grayscale, brightness measured in 'color_space'
+       (see colors.to_brightness);
     2) Resize to 3x3;
     3) Check if center pixel is brighter than all others => 'center';
     4) Else pick whether 'top', 'bottom', 'left', 'right' is brightest;
@@ -14,9 +20,11 @@ def get_light_direction_3x3(image_path):
     """
     try:
         # 1. Open image in grayscale
-        img = Image.open(image_path).convert("L")
-    except Exception:
+        img = Image.open(image_path).convert("RGB")
+    except OSError:
         return None  # Could not open or convert the image
+    brightness = colors.to_brightness(np.asarray(img), color_space)
+    img = Image.fromarray(np.rint(brightness).astype(np.uint8), "L")
 
     # 2. Resize to 3x3 (downsample)
     #    For Pillow >= 9, use Image.Resampling.BOX or .BICUBIC, etc.
@@ -71,11 +79,21 @@ def get_light_direction_3x3(image_path):
     return best_direction
 
 
-# ---------------- Sample Usage ----------------
+DIRECTIONS = ("center", "top", "bottom", "left", "right")
 
-if __name__ == "__main__":
-    movie_name = "llm"
-    main_dir = f"./output/videos/{movie_name}/frames"
+
+def classify_light_directions(
+    movie_name, videos_dir="./output/videos", color_space="luma"
+):
+    """
+    Copy each frame's palette into a folder named after its light direction
+    (frames/<direction>/chunk_XXX_YY.jpg). Folders from a previous run are
+    cleared first so a frame is never left under a stale direction.
+    """
+    main_dir = os.path.join(videos_dir, movie_name, "frames")
+
+    for direction in DIRECTIONS:
+        shutil.rmtree(os.path.join(main_dir, direction), ignore_errors=True)
 
     folders = os.listdir(main_dir)
 
@@ -90,7 +108,7 @@ if __name__ == "__main__":
             if fname.lower().endswith(".jpg") and fname.startswith("lightmap_"):
                 frame_num = fname.split("_")[-1].split(".")[0]
                 path = os.path.join(folder_path, fname)
-                direction = get_light_direction_3x3(path)
+                direction = get_light_direction_3x3(path, color_space)
                 # print(f"{fname} => {direction}")
 
             if direction is not None:
@@ -106,3 +124,10 @@ if __name__ == "__main__":
             else:
                 pass
                 # print(f"Could not classify {fname}")
+
+
+# ---------------- Sample Usage ----------------
+
+if __name__ == "__main__":
+    movie_name = "llm"
+    classify_light_directions(movie_name)
@@ -1,21 +1,29 @@
+import argparse
 import os
-from PIL import Image
-import numpy as np
-import json
+from itertools import islice
+from functools import partial
+from frames import OUTPUT_PREFIXES
+from lazy import LazyModule
+from light_direction import DIRECTIONS
 
 
-folder_dir = "data"
+# heavy dependencies, imported the first time a function uses them
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+colors = LazyModule("colors")
 
-output_dir = "output"
 
-image_files = [f for f in os.listdir(folder_dir) if f.endswith(".png")]
+folder_dir = "data/images"
+
+output_dir = "output"
 
 
-def get_image_colors(image_path):
+def get_image_colors(image_path, color_space="rgb"):
     # Open the image
     img = Image.open(image_path)
 
-    frame_name, altitude = parse_img_name(image_path)
+    # the name is not parsed here, so any image name works
+    frame_name = os.path.basename(image_path)
     print(frame_name)
     # Convert to RGB (if not already)
     img = img.convert("RGB")
@@ -28,7 +36,12 @@ def get_image_colors(image_path):
     pixels = img_array.reshape(-1, 3)
     # Get unique colors
     unique_colors = np.unique(pixels, axis=0)
-    avg_color = np.mean(unique_colors, axis=0)
+    if color_space == "rgb":
+        avg_color = np.mean(unique_colors, axis=0)
+    else:
+        # average in the given color space, then back to RGB
+        values = colors.convert(unique_colors, color_space)
+        avg_color = colors.to_rgb(colors.mean_color(values, color_space), color_space)
 
     # map into int but a list
     avg_color = list(map(int, avg_color))
@@ -36,7 +49,6 @@ def get_image_colors(image_path):
     frame_result = {
         "name": frame_name,
         "average_color": avg_color,
-        "altitude": altitude,
     }
     # average
     # for y in range(img_array.shape[0]):
@@ -76,43 +88,172 @@ def create_image_block(rgb_array, img_name):
     img.save(f"{output_dir}/{img_name}.png")
 
 
-output = {}
-
-initial_image = os.path.join(folder_dir, image_files[0])
-
-initial_image = Image.open(initial_image)
-
-initial_image_rgb = initial_image.convert("RGB")
-
-initial_image_rgb = np.array(initial_image_rgb)
-
-category = {}
-
-for file in image_files:
-    image_path = os.path.join(folder_dir, file)
-    frame_name, altitude = parse_img_name(image_path)
-    avg_color, frame_result = get_image_colors(image_path)
-
-    if frame_result["altitude"] not in category:
-        category[frame_result["altitude"]] = []
-    category[frame_result["altitude"]].append(frame_result)
+def get_movie_name(image_path):
+    """
+    Return the movie an image belongs to: the folder right under "videos"
+    (output/videos/<movie>/frames/...), or the image's folder otherwise.
+    """
+    parts = os.path.normpath(image_path).split(os.sep)
+    if "videos" in parts[:-1]:
+        return parts[parts.index("videos") + 1]
+    return parts[-2] if len(parts) > 1 else ""
+
+
+def get_altitude(image_path):
+    """
+    Return the altitude of an image named "<frame>_<altitude>.png".
+    """
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    if "_" not in name:
+        raise ValueError(
+            f"{image_path} is not named <frame>_<altitude>, "
+            "use another aggregation key for it"
+        )
+    return parse_img_name(name)[1]
+
+
+def get_frame_name(image_path):
+    """
+    Return the frame of an image: <frame> for "<frame>_<altitude>.png" names,
+    and "chunk_XXX/NN" for the frames split from a movie (chunk_XXX/NN.jpg).
+    """
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    if "_" in name:
+        return parse_img_name(name)[0]
+    folder = os.path.basename(os.path.dirname(image_path))
+    if folder.startswith("chunk_"):
+        return f"{folder}/{name}"
+    return name
+
+
+# functions that map an image path to the key it is aggregated under
+aggregation_keys = {
+    "altitude": get_altitude,
+    "frame": get_frame_name,
+    "movie": get_movie_name,
+}
+
+
+def iter_image_paths(directories, extensions=(".png", ".jpg")):
+    """
+    Lazily yield the path of every image in the given directories and their
+    subfolders (e.g. the chunk_XXX folders of output/videos/<movie>/frames).
+    The images saved by process_frames and the light direction folders are
+    skipped, so only the original frames are yielded.
+
+    :param extensions: File extensions to treat as images.
+    """
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d not in DIRECTIONS)
+            for fname in sorted(files):
+                if fname.lower().endswith(extensions) and not fname.startswith(
+                    OUTPUT_PREFIXES
+                ):
+                    yield os.path.join(root, fname)
+
+
+def compute_image_color(image_path, color_space="rgb"):
+    """
+    Worker task: return the image path along with its average color.
+    """
+    avg_color, _ = get_image_colors(image_path, color_space)
+    return image_path, avg_color
+
+
+def aggregate_colors(
+    image_paths, key="altitude", workers=None, chunksize=16, color_space="rgb"
+):
+    """
+    Average the colors of the images grouped by 'key', using a pool of workers.
+    Only a running sum and count is kept per group, so memory grows with the
+    number of groups and not with the number of images.
+
+    :param image_paths: Iterable of image paths, consumed lazily.
+    :param key: One of aggregation_keys - "altitude", "frame" or "movie".
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param chunksize: Number of images handed to a worker at a time.
+    :param color_space: Color space each image's colors are averaged in.
+    :return: {group: (average_color, frequency)}
+    """
+    # multiprocessing alone costs more to import than the rest of this module
+    from multiprocessing import Pool
+
+    if key not in aggregation_keys:
+        raise ValueError(f"key must be one of {list(aggregation_keys)}, got {key!r}")
+    key_func = aggregation_keys[key]
+
+    workers = workers or os.cpu_count()
+    # feed the pool in bounded batches so the task queue does not hold
+    # every path of a large directory at once
+    batch_size = workers * chunksize * 4
+
+    sums = {}
+    counts = {}
+    with Pool(workers) as pool:
+        image_paths = iter(image_paths)
+        while True:
+            batch = list(islice(image_paths, batch_size))
+            if not batch:
+                break
+            for image_path, avg_color in pool.imap_unordered(
+                partial(compute_image_color, color_space=color_space),
+                batch,
+                chunksize,
+            ):
+                group = key_func(image_path)
+                if group not in sums:
+                    sums[group] = np.zeros(3, dtype=np.int64)
+                    counts[group] = 0
+                sums[group] += avg_color
+                counts[group] += 1
+
+    return {
+        group: (list(map(int, sums[group] / counts[group])), counts[group])
+        for group in sums
+    }
 
-    # create_image_block(
-    #     avg_color,
-    #     frame_name
-    #     + "_"
-    #     + str(avg_color[0])
-    #     + "_"
-    #     + str(avg_color[1])
-    #     + "_"
-    #     + str(avg_color[2]),
-    # )
-    # break
 
-# for each category get the average color
-for alt in category:
-    alt_category = category[alt]
-    frequency = len(alt_category)
-    alt_avg_color = np.mean([x["average_color"] for x in alt_category], axis=0)
-    alt_avg_color = list(map(int, alt_avg_color))
-    create_image_block(alt_avg_color, alt + "frequency" + "_" + str(frequency))
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Average the colors of images grouped by altitude, frame or movie."
+    )
+    parser.add_argument(
+        "directories",
+        nargs="*",
+        default=[folder_dir],
+        help=f"folders to read images from, defaults to {folder_dir}",
+    )
+    parser.add_argument(
+        "--key",
+        choices=list(aggregation_keys),
+        default="altitude",
+        help="what the images are grouped by",
+    )
+    parser.add_argument(
+        "--color-space",
+        choices=colors.COLOR_SPACES,
+        default="rgb",
+        help="color space the colors of each image are averaged in",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    result = aggregate_colors(
+        iter_image_paths(args.directories),
+        key=args.key,
+        workers=args.workers,
+        color_space=args.color_space,
+    )
+    if not result:
+        print("No images found in directories:", ", ".join(args.directories))
+
+    # for each category get the average color; frame keys of movie frames
+    # look like chunk_XXX/NN, which is not a valid file name
+    for group, (avg_color, frequency) in result.items():
+        group = group.replace("/", "_")
+        create_image_block(avg_color, group + "frequency" + "_" + str(frequency))
@@ -0,0 +1,365 @@
+import os
+import numpy as np
+from PIL import Image
+
+
+videos_dir = "./output/videos"
+index_path = "./output/palette_index.npz"
+
+# each frame is described by its 4x4 palette (48 values), average color (3)
+# and dominant color (3), in that order
+PALETTE_SLICE = slice(0, 48)
+AVERAGE_SLICE = slice(48, 51)
+DOMINANT_SLICE = slice(51, 54)
+FEATURE_DIM = 54
+
+# number of levels per channel for the coarse bucket layer (8 x 8 x 8 buckets)
+BUCKET_LEVELS = 8
+
+
+def empty_index():
+    """
+    Return an index with no frames in it.
+    The index is a plain dict of parallel arrays, one row per frame.
+    """
+    return {
+        "features": np.zeros((0, FEATURE_DIM), dtype=np.float32),
+        "sq_norms": np.zeros(0, dtype=np.float32),
+        "averages": np.zeros((0, 3), dtype=np.float32),
+        "dominants": np.zeros((0, 3), dtype=np.float32),
+        "average_sq_norms": np.zeros(0, dtype=np.float32),
+        "dominant_sq_norms": np.zeros(0, dtype=np.float32),
+        "buckets": np.zeros(0, dtype=np.int32),
+        "bucket_order": np.zeros(0, dtype=np.int64),
+        "sorted_buckets": np.zeros(0, dtype=np.int32),
+        "dominant_buckets": np.zeros(0, dtype=np.int32),
+        "dominant_bucket_order": np.zeros(0, dtype=np.int64),
+        "sorted_dominant_buckets": np.zeros(0, dtype=np.int32),
+        "movie_names": np.zeros(0, dtype=str),
+        "movie_ids": np.zeros(0, dtype=np.int32),
+        "chunks": np.zeros(0, dtype=np.int32),
+        "frames": np.zeros(0, dtype=np.int32),
+    }
+
+
+def read_block_color(path):
+    """
+    Read a solid color block (dominant_ / average_ image) and return its (R, G, B).
+    We average the whole block so jpg noise does not leak into the color.
+    """
+    img = Image.open(path).convert("RGB")
+    return np.asarray(img, dtype=np.float32).reshape(-1, 3).mean(axis=0)
+
+
+def read_palette(path):
+    """
+    Read a palette_ image and return its 4x4 cells as a flat array of 48 values.
+    """
+    img = Image.open(path).convert("RGB")
+    img_4x4 = img.resize((4, 4), Image.Resampling.BOX)
+    return np.asarray(img_4x4, dtype=np.float32).reshape(-1)
+
+
+def color_bucket(colors):
+    """
+    Quantize (N, 3) colors into a single bucket id per color.
+    """
+    levels = np.clip(
+        (np.asarray(colors, dtype=np.float32) * BUCKET_LEVELS) // 256,
+        0,
+        BUCKET_LEVELS - 1,
+    ).astype(np.int32)
+    levels = levels.reshape(-1, 3)
+    return (levels[:, 0] * BUCKET_LEVELS + levels[:, 1]) * BUCKET_LEVELS + levels[:, 2]
+
+
+def neighbour_buckets(color, radius=1):
+    """
+    Return the bucket ids within 'radius' levels of the bucket holding 'color'.
+    """
+    level = np.clip(
+        (np.asarray(color, dtype=np.float32) * BUCKET_LEVELS) // 256,
+        0,
+        BUCKET_LEVELS - 1,
+    ).astype(np.int32)
+    offsets = np.arange(-radius, radius + 1)
+    grid = np.stack(np.meshgrid(offsets, offsets, offsets, indexing="ij"), axis=-1)
+    neighbours = grid.reshape(-1, 3) + level
+    valid = np.all((neighbours >= 0) & (neighbours < BUCKET_LEVELS), axis=1)
+    neighbours = neighbours[valid]
+    return (neighbours[:, 0] * BUCKET_LEVELS + neighbours[:, 1]) * BUCKET_LEVELS + (
+        neighbours[:, 2]
+    )
+
+
+def load_movie_features(movie):
+    """
+    Collect the per-frame features that frames.py saved for one movie.
+
+    :param movie: Name of the movie folder under videos_dir.
+    :return: (features, chunks, frames) arrays, one row per frame.
+    """
+    main_dir = os.path.join(videos_dir, movie, "frames")
+    features, chunks, frames = [], [], []
+
+    for folder in sorted(os.listdir(main_dir)):
+        folder_path = os.path.join(main_dir, folder)
+        # only chunk_XXX folders hold the outputs of process_frames
+        if not os.path.isdir(folder_path) or not folder.startswith("chunk_"):
+            continue
+        chunk_num = int(folder.split("_")[-1])
+
+        for fname in sorted(os.listdir(folder_path)):
+            if not (fname.lower().endswith(".jpg") and fname.startswith("palette_")):
+                continue
+            frame_num = fname.split("_")[-1].split(".")[0]
+            average_path = os.path.join(folder_path, f"average_{frame_num}.jpg")
+            dominant_path = os.path.join(folder_path, f"dominant_{frame_num}.jpg")
+            if not (os.path.exists(average_path) and os.path.exists(dominant_path)):
+                continue
+
+            feature = np.empty(FEATURE_DIM, dtype=np.float32)
+            feature[PALETTE_SLICE] = read_palette(os.path.join(folder_path, fname))
+            feature[AVERAGE_SLICE] = read_block_color(average_path)
+            feature[DOMINANT_SLICE] = read_block_color(dominant_path)
+            features.append(feature)
+            chunks.append(chunk_num)
+            frames.append(int(frame_num))
+
+    return (
+        np.array(features, dtype=np.float32).reshape(-1, FEATURE_DIM),
+        np.array(chunks, dtype=np.int32),
+        np.array(frames, dtype=np.int32),
+    )
+
+
+def add_movie(index, movie):
+    """
+    Add every processed frame of 'movie' to the index.
+    If the movie is already indexed its rows are replaced, so a re-processed
+    movie can simply be added again.
+
+    :return: The updated index.
+    """
+    features, chunks, frames = load_movie_features(movie)
+    if len(features) == 0:
+        print("No palettes found for movie:", movie)
+        return index
+
+    movie_names = index["movie_names"]
+    if movie in movie_names:
+        movie_id = int(np.flatnonzero(movie_names == movie)[0])
+    else:
+        movie_id = len(movie_names)
+        movie_names = np.append(movie_names, movie)
+    keep = index["movie_ids"] != movie_id
+
+    averages = np.ascontiguousarray(features[:, AVERAGE_SLICE])
+    dominants = np.ascontiguousarray(features[:, DOMINANT_SLICE])
+    buckets = np.concatenate([index["buckets"][keep], color_bucket(averages)])
+    dominant_buckets = np.concatenate(
+        [index["dominant_buckets"][keep], color_bucket(dominants)]
+    )
+    # rows sorted by bucket, so a bucket's rows are one contiguous range
+    bucket_order = np.argsort(buckets, kind="stable")
+    dominant_bucket_order = np.argsort(dominant_buckets, kind="stable")
+    return {
+        "features": np.concatenate([index["features"][keep], features]),
+        "sq_norms": np.concatenate(
+            [index["sq_norms"][keep], np.einsum("ij,ij->i", features, features)]
+        ),
+        # contiguous copies so color queries do not stride over the full vector
+        "averages": np.concatenate([index["averages"][keep], averages]),
+        "dominants": np.concatenate([index["dominants"][keep], dominants]),
+        "average_sq_norms": np.concatenate(
+            [
+                index["average_sq_norms"][keep],
+                np.einsum("ij,ij->i", averages, averages),
+            ]
+        ),
+        "dominant_sq_norms": np.concatenate(
+            [
+                index["dominant_sq_norms"][keep],
+                np.einsum("ij,ij->i", dominants, dominants),
+            ]
+        ),
+        "buckets": buckets,
+        "bucket_order": bucket_order,
+        "sorted_buckets": buckets[bucket_order],
+        "dominant_buckets": dominant_buckets,
+        "dominant_bucket_order": dominant_bucket_order,
+        "sorted_dominant_buckets": dominant_buckets[dominant_bucket_order],
+        "movie_names": movie_names,
+        "movie_ids": np.concatenate(
+            [index["movie_ids"][keep], np.full(len(features), movie_id, np.int32)]
+        ),
+        "chunks": np.concatenate([index["chunks"][keep], chunks]),
+        "frames": np.concatenate([index["frames"][keep], frames]),
+    }
+
+
+def build_index(movies=None):
+    """
+    Build an index over the given movies, or every movie under videos_dir.
+    """
+    if movies is None:
+        movies = sorted(
+            m
+            for m in os.listdir(videos_dir)
+            if os.path.isdir(os.path.join(videos_dir, m, "frames"))
+        )
+    index = empty_index()
+    for mov in movies:
+        index = add_movie(index, mov)
+        print(f"Indexed {mov}")
+    return index
+
+
+def save_index(index, path=index_path):
+    np.savez(path, **index)
+
+
+def load_index(path=index_path):
+    """
+    Load a saved index, or return an empty one if nothing was saved yet.
+    """
+    if not os.path.exists(path):
+        return empty_index()
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def top_k(features, sq_norms, query, k=10, candidates=None):
+    """
+    Brute force search for the k rows of 'features' nearest to 'query'
+    (squared euclidean).
+
+    :param sq_norms: Precomputed squared norms of the rows of 'features'.
+    :param candidates: Optional row indices to restrict the search to.
+    :return: (rows, distances) sorted from nearest to farthest.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    rows = np.arange(len(features)) if candidates is None else candidates
+    if candidates is not None:
+        features = features[candidates]
+        sq_norms = sq_norms[candidates]
+    if len(rows) == 0:
+        return rows, np.zeros(0, dtype=np.float32)
+
+    # |a - b|^2 = |a|^2 - 2ab + |b|^2, one matrix-vector product for all rows
+    distances = sq_norms - 2 * (features @ query) + query @ query
+    k = min(k, len(rows))
+    nearest = np.argpartition(distances, k - 1)[:k]
+    nearest = nearest[np.argsort(distances[nearest])]
+    return rows[nearest], np.maximum(distances[nearest], 0)
+
+
+def bucket_candidates(index, color, k, radius=1, field="average"):
+    """
+    Return the rows whose 'field' color ("average" or "dominant") falls in the
+    buckets around 'color'.
+    Falls back to every row (None) if the buckets hold fewer than k frames.
+    """
+    if field == "average":
+        order = index["bucket_order"]
+        sorted_buckets = index["sorted_buckets"]
+    else:
+        order = index["dominant_bucket_order"]
+        sorted_buckets = index["sorted_dominant_buckets"]
+    codes = neighbour_buckets(color, radius)
+    starts = np.searchsorted(sorted_buckets, codes, side="left")
+    ends = np.searchsorted(sorted_buckets, codes, side="right")
+    if np.sum(ends - starts) < k:
+        return None
+    return np.concatenate([order[s:e] for s, e in zip(starts, ends)])
+
+
+def find_frame(index, movie, chunk, frame):
+    """
+    Return the row of a frame in the index, or None if it is not indexed.
+    """
+    movie_match = np.flatnonzero(index["movie_names"] == movie)
+    if len(movie_match) == 0:
+        return None
+    match = np.flatnonzero(
+        (index["movie_ids"] == movie_match[0])
+        & (index["chunks"] == chunk)
+        & (index["frames"] == frame)
+    )
+    if len(match) == 0:
+        return None
+    return int(match[0])
+
+
+def describe(index, rows, distances):
+    return [
+        {
+            "movie": str(index["movie_names"][index["movie_ids"][row]]),
+            "chunk": int(index["chunks"][row]),
+            "frame": int(index["frames"][row]),
+            "distance": float(np.sqrt(dist)),
+        }
+        for row, dist in zip(rows, distances)
+    ]
+
+
+def query_by_frame(index, movie, chunk, frame, k=10):
+    """
+    Find the k frames whose palettes look most like the given frame.
+    The frame itself is left out of the results.
+    There is no bucket layer here: similar average colors still cover about half
+    the catalogue, and gathering those 54 value rows costs more than comparing
+    against every frame.
+
+    :return: A list of {"movie", "chunk", "frame", "distance"} dicts.
+    """
+    row = find_frame(index, movie, chunk, frame)
+    if row is None:
+        raise KeyError(f"Frame {frame} of chunk {chunk} in {movie} is not indexed")
+
+    query = index["features"][row]
+    rows, distances = top_k(index["features"], index["sq_norms"], query, k + 1)
+    keep = rows != row
+    return describe(index, rows[keep][:k], distances[keep][:k])
+
+
+def query_by_color(index, color, k=10, field="average", use_buckets=False):
+    """
+    Find the k frames whose color is closest to 'color'.
+
+    :param color: (R, G, B) to search for.
+    :param field: "average" or "dominant" - which frame color to compare.
+    :param use_buckets: Only compare against frames whose color is in a
+        neighbouring bucket of 'color'.
+    :return: A list of {"movie", "chunk", "frame", "distance"} dicts.
+    """
+    fields = {
+        "average": ("averages", "average_sq_norms"),
+        "dominant": ("dominants", "dominant_sq_norms"),
+    }
+    if field not in fields:
+        raise ValueError(f"field must be one of {list(fields)}, got {field!r}")
+
+    candidates = None
+    if use_buckets:
+        candidates = bucket_candidates(index, color, k, field=field)
+    colors, sq_norms = fields[field]
+    rows, distances = top_k(
+        index[colors], index[sq_norms], color, k, candidates=candidates
+    )
+    return describe(index, rows, distances)
+
+
+if __name__ == "__main__":
+    index = build_index()
+    save_index(index)
+    print(f"Saved {len(index['features'])} frames to {index_path}")
+
+    # when a new movie is processed:
+    # index = add_movie(load_index(), "llm")
+    # save_index(index)
+
+    for match in query_by_frame(index, "kiss_the_girl", 0, 0, k=5):
+        print(match)
+    for match in query_by_color(index, (20, 60, 120), k=5):
+        print(match)
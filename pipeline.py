@@ -0,0 +1,433 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+from light_direction import DIRECTIONS
+
+
+data_dir = "data/videos"
+videos_dir = "output/videos"
+# stamp of the strip stage, which covers every movie at once
+strip_stamp_dir = "output/.pipeline"
+
+# per-movie stages, in dependency order; "strip" runs once all movies are done
+MOVIE_STAGES = ["download", "split", "analyze", "classify"]
+STAGES = MOVIE_STAGES + ["strip"]
+
+
+def video_path(movie):
+    return os.path.join(data_dir, f"{movie}.mp4")
+
+
+def frame_files(movie, pattern):
+    """
+    Return the sorted paths matching 'pattern' inside every chunk folder of a movie.
+    """
+    return sorted(
+        glob.glob(os.path.join(videos_dir, movie, "frames", "chunk_*", pattern))
+    )
+
+
+def raw_frames(movie):
+    # frames saved by split_video_to_chunks are named "<second>.jpg"
+    return frame_files(movie, "[0-9]*.jpg")
+
+
+def direction_files(movie):
+    return sorted(
+        path
+        for direction in DIRECTIONS
+        for path in glob.glob(
+            os.path.join(videos_dir, movie, "frames", direction, "*.jpg")
+        )
+    )
+
+
+def run_download(movie, params):
+    from download import download_video
+
+    os.makedirs(data_dir, exist_ok=True)
+    if download_video(params["url"], data_dir, f"{movie}.mp4") is None:
+        raise RuntimeError(f"Could not download {movie} from {params['url']}")
+
+
+def run_split(movie, params):
+    from moviepy import VideoFileClip
+    from video import split_video_to_chunks
+
+    # make sure the video can be read before the old chunks are removed
+    VideoFileClip(video_path(movie)).close()
+
+    # drop the previous chunks, a new chunk duration gives a different layout
+    output_dir = os.path.join(videos_dir, movie)
+    shutil.rmtree(os.path.join(output_dir, "frames"), ignore_errors=True)
+    shutil.rmtree(os.path.join(output_dir, "audio"), ignore_errors=True)
+    split_video_to_chunks(video_path(movie), output_dir, params["chunk_duration"])
+
+
+def run_analyze(movie, params):
+    from frames import process_movie
+
+    process_movie(movie, videos_dir, params["color_space"], params["brightness_space"])
+
+
+def run_classify(movie, params):
+    from light_direction import classify_light_directions
+
+    classify_light_directions(movie, videos_dir, params["brightness_space"])
+
+
+def run_strip(movies, params):
+    from create_strip import create_image_strip
+
+    create_image_strip(
+        movies,
+        videos_dir=videos_dir,
+        width_cnt=params["width_cnt"],
+        scale_size=params["scale_size"],
+        output_path=params["output_path"],
+    )
+
+
+# each stage declares what it reads and writes; a stage is skipped when its
+# inputs, outputs and parameters all match the stamp left by its last run
+stages = {
+    "download": {
+        "inputs": lambda movie, params: [],
+        "outputs": lambda movie, params: [video_path(movie)],
+        "run": run_download,
+    },
+    "split": {
+        "inputs": lambda movie, params: [video_path(movie)],
+        "outputs": lambda movie, params: raw_frames(movie),
+        "run": run_split,
+    },
+    "analyze": {
+        "inputs": lambda movie, params: raw_frames(movie),
+        "outputs": lambda movie, params: sorted(
+            frame_files(movie, "dominant_*.jpg")
+            + frame_files(movie, "average_*.jpg")
+            + frame_files(movie, "palette_*.jpg")
+            + frame_files(movie, "lightmap_*.jpg")
+        ),
+        "run": run_analyze,
+    },
+    "classify": {
+        "inputs": lambda movie, params: sorted(
+            frame_files(movie, "lightmap_*.jpg") + frame_files(movie, "palette_*.jpg")
+        ),
+        "outputs": lambda movie, params: direction_files(movie),
+        "run": run_classify,
+    },
+    "strip": {
+        "inputs": lambda movies, params: [
+            path for movie in movies for path in frame_files(movie, "palette_*.jpg")
+        ],
+        "outputs": lambda movies, params: [params["output_path"]],
+        "run": run_strip,
+    },
+}
+
+
+def file_signature(paths):
+    """
+    Return [path, mtime, size] for every path, so a changed file is noticed.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            signature.append([path, None, None])
+            continue
+        signature.append([path, stat.st_mtime_ns, stat.st_size])
+    return signature
+
+
+def stamp_path(stage, movie):
+    if stage == "strip":
+        return os.path.join(strip_stamp_dir, "strip.json")
+    return os.path.join(videos_dir, movie, ".pipeline", f"{stage}.json")
+
+
+def read_stamp(stage, movie):
+    path = stamp_path(stage, movie)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_stamp(stage, movie, params, inputs, outputs):
+    path = stamp_path(stage, movie)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stamp = {
+        "params": params,
+        "inputs": file_signature(inputs),
+        "outputs": file_signature(outputs),
+    }
+    with open(path, "w") as f:
+        json.dump(stamp, f)
+
+
+def is_up_to_date(stage, movie, params, inputs, outputs):
+    """
+    A stage is up to date if it ran before with the same parameters, and
+    neither its inputs nor its outputs changed since.
+    """
+    stamp = read_stamp(stage, movie)
+    if stamp is None:
+        return False
+    return (
+        stamp["params"] == params
+        and stamp["inputs"] == file_signature(inputs)
+        and stamp["outputs"] == file_signature(outputs)
+    )
+
+
+def outputs_are_newer(inputs, outputs):
+    """
+    True if every output exists and none is older than an input, as make decides.
+    """
+    if not outputs or not all(os.path.exists(path) for path in outputs):
+        return False
+    inputs = [path for path in inputs if os.path.exists(path)]
+    if not inputs:
+        return True
+    newest_input = max(os.stat(path).st_mtime_ns for path in inputs)
+    return newest_input <= min(os.stat(path).st_mtime_ns for path in outputs)
+
+
+def run_stage(stage, target, params, force=False):
+    """
+    Run one stage for 'target' (a movie, or the list of movies for "strip")
+    unless it is up to date.
+
+    :return: True if the stage ran, False if it was skipped.
+    """
+    definition = stages[stage]
+    movie = target if stage != "strip" else None
+    inputs = definition["inputs"](target, params)
+    outputs = definition["outputs"](target, params)
+
+    if stage in ("download", "split") and not os.path.exists(video_path(target)):
+        # without the source video, the frames already split are all we have
+        if raw_frames(target) and (stage == "split" or params["url"] is None):
+            print(f"[{stage}] {movie} has no source video, keeping its frames")
+            return False
+        if stage == "download" and params["url"] is None:
+            raise FileNotFoundError(
+                f"{video_path(target)} does not exist, no url was given "
+                "and there are no frames to keep"
+            )
+    elif stage == "download" and params["url"] is None:
+        # the video is already there and there is nothing to download it from
+        return False
+
+    if (
+        not force
+        and read_stamp(stage, movie) is None
+        and outputs_are_newer(inputs, outputs)
+    ):
+        # outputs made before the pipeline existed, or by hand: take them
+        # as they are instead of rebuilding them
+        print(f"[{stage}] adopting the existing outputs of {movie or 'all movies'}")
+        write_stamp(stage, movie, params, inputs, outputs)
+        return False
+
+    if not force and is_up_to_date(stage, movie, params, inputs, outputs):
+        print(f"[{stage}] {movie or 'all movies'} is up to date, skipping")
+        return False
+
+    print(f"[{stage}] running for {movie or 'all movies'}")
+    definition["run"](target, params)
+    write_stamp(
+        stage,
+        movie,
+        params,
+        definition["inputs"](target, params),
+        definition["outputs"](target, params),
+    )
+    return True
+
+
+def stage_params(stage, movie, config):
+    """
+    Return the parameters of 'stage' from the command line config.
+    Changing any of them makes the stage (and the stages after it) run again.
+    """
+    if stage == "download":
+        return {"url": config["urls"].get(movie)}
+    if stage == "split":
+        return {"chunk_duration": config["chunk_duration"]}
+    if stage == "analyze":
+        return {
+            "color_space": config["color_space"],
+            "brightness_space": config["brightness_space"],
+        }
+    if stage == "classify":
+        return {"brightness_space": config["brightness_space"]}
+    if stage == "strip":
+        return {
+            "movies": config["movies"],
+            "width_cnt": config["width_cnt"],
+            "scale_size": config["scale_size"],
+            "output_path": config["strip_path"],
+        }
+    return {}
+
+
+def run_movie(movie, config):
+    """
+    Run the per-movie stages for one movie, in order.
+    """
+    for stage in MOVIE_STAGES[: MOVIE_STAGES.index(config["until"]) + 1]:
+        params = stage_params(stage, movie, config)
+        run_stage(stage, movie, params, force=stage in config["force"])
+    return movie
+
+
+def worker_count(movies, jobs, max_memory_gb, movie_memory_gb):
+    """
+    Number of movies to process at once, within the CPU and memory budget.
+    """
+    workers = min(len(movies), jobs or os.cpu_count())
+    if max_memory_gb is not None:
+        workers = min(workers, int(max_memory_gb // movie_memory_gb))
+    return max(1, workers)
+
+
+def run_pipeline(movies, config, workers=1):
+    """
+    Run every stage for every movie, processing up to 'workers' movies at once,
+    then build the strip image over all of them.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    failed = []
+    if config["until"] == "strip":
+        movie_until = MOVIE_STAGES[-1]
+    else:
+        movie_until = config["until"]
+    movie_config = dict(config, until=movie_until)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_movie, movie, movie_config): movie for movie in movies
+        }
+        for future in as_completed(futures):
+            movie = futures[future]
+            try:
+                future.result()
+                print(f"Finished {movie}")
+            except Exception as e:
+                print(f"Failed {movie}: {e}")
+                failed.append(movie)
+
+    if failed:
+        print("Skipping the strip image, these movies failed:", ", ".join(failed))
+        return False
+
+    if config["until"] == "strip":
+        params = stage_params("strip", None, config)
+        try:
+            run_stage("strip", movies, params, force="strip" in config["force"])
+        except ValueError as e:
+            print(f"Failed strip image: {e}")
+            return False
+    return True
+
+
+def parse_args():
+    from colors import COLOR_SPACES
+
+    parser = argparse.ArgumentParser(
+        description="Run download -> split -> analyze -> classify -> strip for "
+        "one or many movies, skipping the stages that are up to date."
+    )
+    parser.add_argument(
+        "movies",
+        nargs="*",
+        help=f"movie names, defaults to every video in {data_dir} and every --url",
+    )
+    parser.add_argument(
+        "--url",
+        action="append",
+        default=[],
+        metavar="MOVIE=URL",
+        help="YouTube url to download a movie from",
+    )
+    parser.add_argument("--chunk-duration", type=int, default=10)
+    parser.add_argument(
+        "--color-space",
+        choices=COLOR_SPACES,
+        default="rgb",
+        help="color space the average colors and palettes are computed in",
+    )
+    parser.add_argument(
+        "--brightness-space",
+        choices=COLOR_SPACES,
+        default="luma",
+        help="color space brightness is measured in for black bars, light maps "
+        "and light directions",
+    )
+    parser.add_argument("--width-cnt", type=int, default=30)
+    parser.add_argument("--scale-size", type=int, default=50)
+    parser.add_argument("--strip-path", default="strip_image.png")
+    parser.add_argument(
+        "--until", choices=STAGES, default="strip", help="last stage to run"
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        choices=STAGES,
+        default=[],
+        help="run a stage even if it is up to date (later stages follow)",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="movies to process at once"
+    )
+    parser.add_argument(
+        "--max-memory-gb",
+        type=float,
+        default=None,
+        help="memory budget shared by all the movies processed at once",
+    )
+    parser.add_argument(
+        "--movie-memory-gb",
+        type=float,
+        default=2.0,
+        help="estimated memory needed to process one movie",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    urls = dict(url.split("=", 1) for url in args.url)
+    movies = args.movies
+    if not movies:
+        movies = sorted(
+            os.path.splitext(f)[0] for f in os.listdir(data_dir) if f.endswith(".mp4")
+        )
+        movies += sorted(movie for movie in urls if movie not in movies)
+
+    config = {
+        "movies": movies,
+        "urls": urls,
+        "chunk_duration": args.chunk_duration,
+        "color_space": args.color_space,
+        "brightness_space": args.brightness_space,
+        "width_cnt": args.width_cnt,
+        "scale_size": args.scale_size,
+        "strip_path": args.strip_path,
+        "until": args.until,
+        "force": args.force,
+    }
+    workers = worker_count(movies, args.jobs, args.max_memory_gb, args.movie_memory_gb)
+    print(f"Processing {len(movies)} movie(s) with {workers} worker(s)")
+
+    if not run_pipeline(movies, config, workers):
+        raise SystemExit(1)
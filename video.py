@@ -1,9 +1,6 @@
 import os
 import math
 
-# from moviepy.editor import VideoFileClip
-from moviepy import VideoFileClip
-
 
 def split_video_to_chunks(video_path: str, output_dir: str, chunk_duration: int = 10):
     """
@@ -14,6 +11,9 @@ def split_video_to_chunks(video_path: str, output_dir: str, chunk_duration: int
     :param output_dir: Directory to store output chunks, audio, and frames.
     :param chunk_duration: Duration (in seconds) of each chunk.
     """
+    # from moviepy.editor import VideoFileClip
+    from moviepy import VideoFileClip
+
     # Load the full video
     clip = VideoFileClip(video_path)
 